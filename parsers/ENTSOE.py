@@ -15,24 +15,64 @@ Consumption Forecast
 import itertools
 import re
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
+from functools import lru_cache
+from io import BytesIO
 from logging import Logger, getLogger
 from random import shuffle
-from typing import Any, Dict, List, Optional, Tuple, Union
+from threading import Lock, local
+from time import monotonic
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
 
 import arrow
-import numpy as np
 import pandas as pd
-from bs4 import BeautifulSoup
+from lxml import etree
 from requests import Response, Session
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from parsers.lib.config import refetch_frequency
 
+from .lib.entsoe_cache import get_response_cache
 from .lib.exceptions import ParserException
 from .lib.utils import get_token, sum_production_dicts
 from .lib.validation import validate
 
 ENTSOE_ENDPOINT = "https://web-api.tp.entsoe.eu/api"
+# Source attached to every datapoint returned by this parser.
+_SOURCE = "entsoe.eu"
+# Maximum number of in-flight requests when querying ENTSOE concurrently,
+# kept low to respect ENTSOE rate limits.
+ENTSOE_MAX_CONCURRENCY = 8
+# Shared session used when a caller does not pass one in, so repeated fetches
+# reuse pooled keep-alive connections instead of paying a new TCP+TLS
+# handshake per call. Transient ENTSOE errors are retried with backoff.
+_DEFAULT_SESSION = Session()
+_DEFAULT_SESSION.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=20,
+        pool_maxsize=20,
+        max_retries=Retry(
+            total=5,
+            backoff_factor=0.5,
+            # Hand the exhausted response back instead of raising RetryError,
+            # so query_ENTSOE can rotate tokens and fall back to a stale
+            # cached body. 429 is deliberately not retried: rate-limited
+            # requests should move on to the next token immediately.
+            raise_on_status=False,
+            status_forcelist=(500, 502, 503, 504),
+        ),
+    ),
+)
+
+
+def _get_session(session: Optional[Session]) -> Session:
+    """Returns the caller's session, falling back to the shared pooled one."""
+    return session or _DEFAULT_SESSION
+
+
 ENTSOE_PARAMETER_DESC = {
     "B01": "Biomass",
     "B02": "Fossil Brown coal/Lignite",
@@ -443,13 +483,66 @@ VALIDATIONS: Dict[str, Dict[str, Any]] = {
 }
 
 
-def closest_in_time_key(
-    x, target_datetime: Optional[datetime], datetime_key="datetime"
-):
-    if target_datetime is None:
-        target_datetime = datetime.utcnow()
-    if isinstance(target_datetime, datetime):
-        return np.abs((x[datetime_key] - target_datetime).seconds)
+# In-process cache of raw ENTSOE responses, keyed by the full query params
+# (minus the security token). Windows covering the current hour can receive
+# new data at any time and are only kept briefly; historical windows are
+# immutable and can be kept for much longer.
+ENTSOE_CACHE_TTL_RECENT = 30  # seconds
+ENTSOE_CACHE_TTL_HISTORICAL = 24 * 3600  # seconds
+_RESPONSE_CACHE_MAX_SIZE = 4096
+# cache_key -> (expires_at, xml_text, conditional request headers)
+_response_cache: Dict[tuple, Tuple[float, str, Dict[str, str]]] = {}
+_response_cache_lock = Lock()
+
+
+def _response_cache_get(cache_key: tuple, allow_stale: bool = False) -> Optional[str]:
+    with _response_cache_lock:
+        entry = _response_cache.get(cache_key)
+        if entry is None:
+            return None
+        expires_at, xml_text, _validators = entry
+        if monotonic() >= expires_at and not allow_stale:
+            return None
+        return xml_text
+
+
+def _response_cache_validators(cache_key: tuple) -> Optional[Dict[str, str]]:
+    """Returns the conditional request headers for a cached response, if any."""
+    with _response_cache_lock:
+        entry = _response_cache.get(cache_key)
+        return entry[2] or None if entry is not None else None
+
+
+def _response_cache_set(
+    cache_key: tuple,
+    xml_text: str,
+    ttl: float,
+    response_headers: Optional[Any] = None,
+) -> None:
+    # Remember the response validators so an expired entry can later be
+    # revalidated with a cheap conditional request instead of a full fetch.
+    validators: Dict[str, str] = {}
+    if response_headers is not None:
+        etag = response_headers.get("ETag")
+        if etag:
+            validators["If-None-Match"] = etag
+        last_modified = response_headers.get("Last-Modified") or response_headers.get(
+            "Date"
+        )
+        if last_modified:
+            validators["If-Modified-Since"] = last_modified
+    with _response_cache_lock:
+        if len(_response_cache) >= _RESPONSE_CACHE_MAX_SIZE:
+            _response_cache.clear()
+        _response_cache[cache_key] = (monotonic() + ttl, xml_text, validators)
+
+
+def _response_cache_touch(cache_key: tuple, ttl: float) -> None:
+    with _response_cache_lock:
+        entry = _response_cache.get(cache_key)
+        if entry is not None:
+            _expires_at, xml_text, validators = entry
+            _response_cache[cache_key] = (monotonic() + ttl, xml_text, validators)
 
 
 def query_ENTSOE(
@@ -481,6 +574,32 @@ def query_ENTSOE(
             message="target_datetime has to be a datetime in query_entsoe",
         )
 
+    # Check the response cache before hitting the network; repeat queries for
+    # the same window are common in back-to-back backfills.
+    cache_key = tuple(sorted(params.items()))
+    cached_response = _response_cache_get(cache_key)
+    if cached_response is not None:
+        return cached_response
+
+    now_hour = datetime.utcnow().strftime("%Y%m%d%H00")
+    is_historical = params["periodEnd"] < now_hour
+    ttl = ENTSOE_CACHE_TTL_HISTORICAL if is_historical else ENTSOE_CACHE_TTL_RECENT
+
+    # Historical windows are immutable, so they can additionally be served
+    # from the optional on-disk cache, which survives across backfill runs.
+    disk_cache = get_response_cache() if is_historical else None
+    disk_cache_key = "&".join("=".join(item) for item in cache_key)
+    if disk_cache is not None:
+        disk_response = disk_cache.get(disk_cache_key)
+        if disk_response is not None:
+            _response_cache_set(cache_key, disk_response, ttl)
+            return disk_response
+
+    # An expired cache entry can still be revalidated: if ENTSOE answers the
+    # conditional request with 304 Not Modified we keep the cached body and
+    # skip the transfer.
+    conditional_headers = _response_cache_validators(cache_key)
+
     # Due to rate limiting, we need to spread our requests across different tokens
     tokens = get_token("ENTSOE_TOKEN").split(",")
     # Shuffle the tokens so that we don't always use the same one first.
@@ -489,19 +608,44 @@ def query_ENTSOE(
     # Try each token until we get a valid response
     for token in tokens:
         params["securityToken"] = token
-        response: Response = session.get(ENTSOE_ENDPOINT, params=params)
+        response: Response = session.get(
+            ENTSOE_ENDPOINT, params=params, headers=conditional_headers
+        )
+        if response.status_code == 304:
+            stale_response = _response_cache_get(cache_key, allow_stale=True)
+            if stale_response is not None:
+                _response_cache_touch(cache_key, ttl)
+                return stale_response
+            # A 304 without a cached body should not happen; retry in full.
+            conditional_headers = None
+            response = session.get(ENTSOE_ENDPOINT, params=params)
         if response.ok:
+            _response_cache_set(cache_key, response.text, ttl, response.headers)
+            if disk_cache is not None:
+                disk_cache.set(disk_cache_key, response.text)
             return response.text
         else:
             last_response_if_all_fail = response
+
+    # All tokens failed; fall back to the last known good response for this
+    # query if we still have one, rather than failing the whole fetch.
+    stale_response = _response_cache_get(cache_key, allow_stale=True)
+    if stale_response is not None:
+        return stale_response
     # If we get here, all tokens failed to fetch valid data
     # and we will check the last response for a error message.
     exception_message = None
     if last_response_if_all_fail is not None:
-        soup = BeautifulSoup(last_response_if_all_fail.text, "html.parser")
-        text = soup.find_all("text")
-        if len(text):
-            error_text = soup.find_all("text")[0].prettify()
+        error_text = None
+        try:
+            root = etree.fromstring(
+                last_response_if_all_fail.text.encode("utf-8"), _xml_parser()
+            )
+            error_text = root.findtext(".//{*}text")
+        except etree.XMLSyntaxError:
+            # Not an ENTSOE acknowledgement document; fall back to the raw body.
+            pass
+        if error_text:
             if "No matching data found" in error_text:
                 exception_message = "No matching data found"
             else:
@@ -689,18 +833,56 @@ def query_wind_solar_production_forecast(
     )
 
 
-def datetime_from_position(
-    start: arrow.Arrow, position: int, resolution: str
-) -> datetime:
-    """Finds time granularity of data."""
+_RESOLUTION_PATTERN = re.compile(r"PT(\d+)M")
+
+
+@lru_cache(maxsize=16)
+def _resolution_in_minutes(resolution: str) -> int:
+    """Parses an ENTSOE resolution string such as PT15M or PT60M to minutes."""
+    m = _RESOLUTION_PATTERN.search(resolution)
+    if m is None:
+        raise NotImplementedError("Could not recognise resolution %s" % resolution)
+    return int(m.group(1))
+
+
+_thread_locals = local()
 
-    m = re.search(r"PT(\d+)([M])", resolution)
-    if m is not None:
-        digits = int(m.group(1))
-        scale = m.group(2)
-        if scale == "M":
-            return start.shift(minutes=(position - 1) * digits).datetime
-    raise NotImplementedError("Could not recognise resolution %s" % resolution)
+
+def _xml_parser() -> etree.XMLParser:
+    """
+    Returns a reusable XML parser for the current thread.
+
+    Reusing the parser amortizes its construction cost across the parse_*
+    calls of a fetch; ID collection, blank-text retention and entity
+    resolution are disabled since the ENTSOE documents don't need them.
+    """
+    parser = getattr(_thread_locals, "xml_parser", None)
+    if parser is None:
+        parser = etree.XMLParser(
+            collect_ids=False,
+            remove_blank_text=True,
+            resolve_entities=False,
+            no_network=True,
+        )
+        _thread_locals.xml_parser = parser
+    return parser
+
+
+def _iter_timeseries(xml_text: str) -> Iterator[etree._Element]:
+    """
+    Streams the TimeSeries elements of an ENTSOE document one at a time.
+
+    Uses lxml's iterparse so the document is parsed in a single C-level pass,
+    and clears each TimeSeries once the caller is done with it so memory stays
+    bounded for large responses.
+    """
+    for _event, element in etree.iterparse(
+        BytesIO(xml_text.encode("utf-8")), tag="{*}TimeSeries"
+    ):
+        yield element
+        element.clear(keep_tail=True)
+        while element.getprevious() is not None:
+            del element.getparent()[0]
 
 
 def parse_scalar(
@@ -711,25 +893,28 @@ def parse_scalar(
 
     if not xml_text:
         return None
-    soup = BeautifulSoup(xml_text, "html.parser")
     # Get all points
     values = []
     datetimes = []
-    for timeseries in soup.find_all("timeseries"):
-        resolution = str(timeseries.find_all("resolution")[0].contents[0])
-        datetime_start = arrow.get(timeseries.find_all("start")[0].contents[0])
+    for timeseries in _iter_timeseries(xml_text):
         if only_inBiddingZone_Domain:
-            if not len(timeseries.find_all("inBiddingZone_Domain.mRID".lower())):
+            if timeseries.find(".//{*}inBiddingZone_Domain.mRID") is None:
                 continue
         elif only_outBiddingZone_Domain:
-            if not len(timeseries.find_all("outBiddingZone_Domain.mRID".lower())):
+            if timeseries.find(".//{*}outBiddingZone_Domain.mRID") is None:
                 continue
-        for entry in timeseries.find_all("point"):
-            position = int(entry.find_all("position")[0].contents[0])
-            value = float(entry.find_all("quantity")[0].contents[0])
-            datetime = datetime_from_position(datetime_start, position, resolution)
+        # Precompute the start and step once; per point the datetime is then
+        # plain timedelta arithmetic.
+        step = timedelta(
+            minutes=_resolution_in_minutes(timeseries.findtext(".//{*}resolution"))
+        )
+        datetime_start = arrow.get(timeseries.findtext(".//{*}start")).datetime
+        for entry in timeseries.iterfind(".//{*}Point"):
+            position = int(entry.findtext("{*}position"))
+            value = float(entry.findtext("{*}quantity"))
+            dt = datetime_start + (position - 1) * step
             values.append(value)
-            datetimes.append(datetime)
+            datetimes.append(dt)
 
     return values, datetimes
 
@@ -740,39 +925,40 @@ def parse_production(
 
     if not xml_text:
         return None
-    soup = BeautifulSoup(xml_text, "html.parser")
-    # Get all points
-    productions = []
-    datetimes = []
-    for timeseries in soup.find_all("timeseries"):
-        resolution = str(timeseries.find_all("resolution")[0].contents[0])
-        datetime_start: arrow.Arrow = arrow.get(
-            timeseries.find_all("start")[0].contents[0]
-        )
-        is_production = (
-            len(timeseries.find_all("inBiddingZone_Domain.mRID".lower())) > 0
+    # Accumulate per datetime; a dict gives O(1) lookups where a
+    # datetimes.index() scan would be O(N) per point.
+    productions: Dict[datetime, defaultdict] = {}
+    for timeseries in _iter_timeseries(xml_text):
+        step = timedelta(
+            minutes=_resolution_in_minutes(timeseries.findtext(".//{*}resolution"))
         )
-        psr_type = str(
-            timeseries.find_all("mktpsrtype")[0].find_all("psrtype")[0].contents[0]
-        )
-
-        for entry in timeseries.find_all("point"):
-            quantity = float(entry.find_all("quantity")[0].contents[0])
-            position = int(entry.find_all("position")[0].contents[0])
-            datetime = datetime_from_position(datetime_start, position, resolution)
-            try:
-                i = datetimes.index(datetime)
+        datetime_start = arrow.get(timeseries.findtext(".//{*}start")).datetime
+        is_production = timeseries.find(".//{*}inBiddingZone_Domain.mRID") is not None
+        psr_type = timeseries.findtext(".//{*}MktPSRType/{*}psrType")
+
+        # Extract all positions and quantities of the TimeSeries in bulk so
+        # the tree walk runs in C rather than once per point.
+        positions = [
+            int(e.text) for e in timeseries.iterfind(".//{*}Point/{*}position")
+        ]
+        quantities = [
+            float(e.text) for e in timeseries.iterfind(".//{*}Point/{*}quantity")
+        ]
+        for position, quantity in zip(positions, quantities):
+            dt = datetime_start + (position - 1) * step
+            production = productions.get(dt)
+            if production is not None:
                 if is_production:
-                    productions[i][psr_type] += quantity
+                    production[psr_type] += quantity
                 elif psr_type in ENTSOE_STORAGE_PARAMETERS:
                     # Only include consumption if it's for storage. In other cases
                     # it is power plant self-consumption which should be ignored.
-                    productions[i][psr_type] -= quantity
-            except ValueError:  # Not in list
-                datetimes.append(datetime)
-                productions.append(defaultdict(lambda: 0))
-                productions[-1][psr_type] = quantity if is_production else -1 * quantity
-    return productions, datetimes
+                    production[psr_type] -= quantity
+            else:
+                production = defaultdict(lambda: 0)
+                production[psr_type] = quantity if is_production else -1 * quantity
+                productions[dt] = production
+    return list(productions.values()), list(productions.keys())
 
 
 def parse_self_consumption(xml_text: str):
@@ -790,31 +976,27 @@ def parse_self_consumption(xml_text: str):
 
     if not xml_text:
         return None
-    soup = BeautifulSoup(xml_text, "html.parser")
+    root = etree.fromstring(xml_text.encode("utf-8"), _xml_parser())
     res = {}
-    for timeseries in soup.find_all("timeseries"):
-        is_consumption = (
-            len(timeseries.find_all("outBiddingZone_Domain.mRID".lower())) > 0
-        )
+    for timeseries in root.iterfind(".//{*}TimeSeries"):
+        is_consumption = timeseries.find(".//{*}outBiddingZone_Domain.mRID") is not None
         if not is_consumption:
             continue
-        psr_type = str(
-            timeseries.find_all("mktpsrtype")[0].find_all("psrtype")[0].contents[0]
-        )
+        psr_type = timeseries.findtext(".//{*}MktPSRType/{*}psrType")
         if psr_type in ENTSOE_STORAGE_PARAMETERS:
             continue
-        resolution = str(timeseries.find_all("resolution")[0].contents[0])
-        datetime_start: arrow.Arrow = arrow.get(
-            timeseries.find_all("start")[0].contents[0]
+        step = timedelta(
+            minutes=_resolution_in_minutes(timeseries.findtext(".//{*}resolution"))
         )
+        datetime_start = arrow.get(timeseries.findtext(".//{*}start")).datetime
 
-        for entry in timeseries.find_all("point"):
-            quantity = float(entry.find_all("quantity")[0].contents[0])
+        for entry in timeseries.iterfind(".//{*}Point"):
+            quantity = float(entry.findtext("{*}quantity"))
             if quantity == 0:
                 continue
-            position = int(entry.find_all("position")[0].contents[0])
-            datetime = datetime_from_position(datetime_start, position, resolution)
-            res[datetime] = res[datetime] + quantity if datetime in res else quantity
+            position = int(entry.findtext("{*}position"))
+            dt = datetime_start + (position - 1) * step
+            res[dt] = res[dt] + quantity if dt in res else quantity
 
     return res
 
@@ -824,38 +1006,26 @@ def parse_production_per_units(xml_text: str) -> Union[Any, None]:
 
     if not xml_text:
         return None
-    soup = BeautifulSoup(xml_text, "html.parser")
+    root = etree.fromstring(xml_text.encode("utf-8"), _xml_parser())
     # Get all points
-    for timeseries in soup.find_all("timeseries"):
-        resolution = str(timeseries.find_all("resolution")[0].contents[0])
-        datetime_start: arrow.Arrow = arrow.get(
-            timeseries.find_all("start")[0].contents[0]
-        )
-        is_production = (
-            len(timeseries.find_all("inBiddingZone_Domain.mRID".lower())) > 0
-        )
-        psr_type = str(
-            timeseries.find_all("mktpsrtype")[0].find_all("psrtype")[0].contents[0]
-        )
-        unit_key = str(
-            timeseries.find_all("mktpsrtype")[0]
-            .find_all("powersystemresources")[0]
-            .find_all("mrid")[0]
-            .contents[0]
-        )
-        unit_name = str(
-            timeseries.find_all("mktpsrtype")[0]
-            .find_all("powersystemresources")[0]
-            .find_all("name")[0]
-            .contents[0]
+    for timeseries in root.iterfind(".//{*}TimeSeries"):
+        step = timedelta(
+            minutes=_resolution_in_minutes(timeseries.findtext(".//{*}resolution"))
         )
+        datetime_start = arrow.get(timeseries.findtext(".//{*}start")).datetime
+        is_production = timeseries.find(".//{*}inBiddingZone_Domain.mRID") is not None
+        mkt_psr_type = timeseries.find(".//{*}MktPSRType")
+        psr_type = mkt_psr_type.findtext("{*}psrType")
+        power_system_resources = mkt_psr_type.find("{*}PowerSystemResources")
+        unit_key = power_system_resources.findtext("{*}mRID")
+        unit_name = power_system_resources.findtext("{*}name")
         if not is_production:
             continue
-        for entry in timeseries.find_all("point"):
-            quantity = float(entry.find_all("quantity")[0].contents[0])
-            position = int(entry.find_all("position")[0].contents[0])
-            datetime = datetime_from_position(datetime_start, position, resolution)
-            key = (unit_key, datetime)
+        for entry in timeseries.iterfind(".//{*}Point"):
+            quantity = float(entry.findtext("{*}quantity"))
+            position = int(entry.findtext("{*}position"))
+            dt = datetime_start + (position - 1) * step
+            key = (unit_key, dt)
             if key in values:
                 if is_production:
                     values[key]["production"] += quantity
@@ -863,7 +1033,7 @@ def parse_production_per_units(xml_text: str) -> Union[Any, None]:
                     values[key]["production"] -= quantity
             else:
                 values[key] = {
-                    "datetime": datetime,
+                    "datetime": dt,
                     "production": quantity,
                     "productionType": ENTSOE_PARAMETER_BY_GROUP[psr_type],
                     "unitKey": unit_key,
@@ -882,38 +1052,32 @@ def parse_exchange(
 
     if not xml_text:
         return None
-    quantities = quantities or []
-    datetimes = datetimes or []
-    soup = BeautifulSoup(xml_text, "html.parser")
+    # Accumulate per datetime in a dict for O(1) lookups instead of scanning
+    # the datetimes list for every point.
+    exchange: Dict[datetime, float] = (
+        dict(zip(datetimes, quantities)) if quantities and datetimes else {}
+    )
     # Get all points
-    for timeseries in soup.find_all("timeseries"):
-        resolution = str(timeseries.find_all("resolution")[0].contents[0])
-        datetime_start: arrow.Arrow = arrow.get(
-            timeseries.find_all("start")[0].contents[0]
-        )
+    for timeseries in _iter_timeseries(xml_text):
         # Only use contract_marketagreement.type == A01 (Total to avoid double counting some columns)
-        if (
-            timeseries.find_all("contract_marketagreement.type")
-            and timeseries.find_all("contract_marketagreement.type")[0].contents[0]
-            != "A05"
-        ):
+        contract_type = timeseries.findtext(".//{*}contract_MarketAgreement.type")
+        if contract_type is not None and contract_type != "A05":
             continue
+        step = timedelta(
+            minutes=_resolution_in_minutes(timeseries.findtext(".//{*}resolution"))
+        )
+        datetime_start = arrow.get(timeseries.findtext(".//{*}start")).datetime
 
-        for entry in timeseries.find_all("point"):
-            quantity = float(entry.find_all("quantity")[0].contents[0])
+        for entry in timeseries.iterfind(".//{*}Point"):
+            quantity = float(entry.findtext("{*}quantity"))
             if not is_import:
                 quantity *= -1
-            position = int(entry.find_all("position")[0].contents[0])
-            datetime = datetime_from_position(datetime_start, position, resolution)
-            # Find out whether or not we should update the net production
-            try:
-                i = datetimes.index(datetime)
-                quantities[i] += quantity
-            except ValueError:  # Not in list
-                quantities.append(quantity)
-                datetimes.append(datetime)
+            position = int(entry.findtext("{*}position"))
+            dt = datetime_start + (position - 1) * step
+            # Update the net quantity for this datetime
+            exchange[dt] = exchange.get(dt, 0) + quantity
 
-    return quantities, datetimes
+    return list(exchange.values()), list(exchange.keys())
 
 
 def parse_price(
@@ -922,21 +1086,20 @@ def parse_price(
 
     if not xml_text:
         return None
-    soup = BeautifulSoup(xml_text, "html.parser")
     # Get all points
     prices: List[float] = []
     currencies: List[str] = []
     datetimes: List[datetime] = []
-    for timeseries in soup.find_all("timeseries"):
-        currency = str(timeseries.find_all("currency_unit.name")[0].contents[0])
-        resolution = str(timeseries.find_all("resolution")[0].contents[0])
-        datetime_start: arrow.Arrow = arrow.get(
-            timeseries.find_all("start")[0].contents[0]
+    for timeseries in _iter_timeseries(xml_text):
+        currency = timeseries.findtext(".//{*}currency_Unit.name")
+        step = timedelta(
+            minutes=_resolution_in_minutes(timeseries.findtext(".//{*}resolution"))
         )
-        for entry in timeseries.find_all("point"):
-            position = int(entry.find_all("position")[0].contents[0])
-            dt = datetime_from_position(datetime_start, position, resolution)
-            prices.append(float(entry.find_all("price.amount")[0].contents[0]))
+        datetime_start = arrow.get(timeseries.findtext(".//{*}start")).datetime
+        for entry in timeseries.iterfind(".//{*}Point"):
+            position = int(entry.findtext("{*}position"))
+            dt = datetime_start + (position - 1) * step
+            prices.append(float(entry.findtext("{*}price.amount")))
             datetimes.append(dt)
             currencies.append(currency)
 
@@ -973,8 +1136,9 @@ def validate_production(
 
 
 def get_wind(values):
-    if "Wind Onshore" in values or "Wind Offshore" in values:
-        return values.get("Wind Onshore", 0) + values.get("Wind Offshore", 0)
+    # B18 is Wind Offshore, B19 is Wind Onshore
+    if "B18" in values or "B19" in values:
+        return values.get("B18", 0) + values.get("B19", 0)
 
 
 @refetch_frequency(timedelta(days=2))
@@ -983,13 +1147,29 @@ def fetch_consumption(
     session: Optional[Session] = None,
     target_datetime: Optional[datetime] = None,
     logger: Logger = getLogger(__name__),
-):
-    """Gets consumption for a specified zone."""
-    session = session or Session()
+    *,
+    columnar: bool = False,
+) -> Union[list, dict]:
+    """Gets consumption for a specified zone.
+
+    When `columnar` is set, the full parsed range is returned as a single dict
+    of parallel lists (one entry per varying field) instead of one dict per
+    datapoint, which avoids building thousands of small dicts on backfills.
+    """
+    session = _get_session(session)
     domain = ENTSOE_DOMAIN_MAPPINGS[zone_key]
-    # Grab consumption
+    # Grab consumption and production in parallel; production is only needed
+    # for the self-consumption it reports.
     parsed = None
-    raw_consumption = query_consumption(domain, session, target_datetime)
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        consumption_future = executor.submit(
+            query_consumption, domain, session, target_datetime
+        )
+        production_future = executor.submit(
+            query_production, domain, session, target_datetime
+        )
+        raw_consumption = consumption_future.result()
+        raw_production = production_future.result()
     if raw_consumption is not None:
         parsed = parse_scalar(
             raw_consumption,
@@ -1002,7 +1182,6 @@ def fetch_consumption(
         # self_consumption is a dict of datetimes to the total self-consumption value from all sources.
         # Only datetimes where the value > 0 are included.
         self_consumption = None
-        raw_production = query_production(domain, session, target_datetime)
         if raw_production is not None:
             self_consumption = parse_self_consumption(
                 raw_production,
@@ -1017,6 +1196,13 @@ def fetch_consumption(
                     )
                     continue
                 quantities[i] += value
+            if columnar:
+                return {
+                    "zoneKey": zone_key,
+                    "datetime": datetimes,
+                    "consumption": quantities,
+                    "source": "entsoe.eu",
+                }
             # if a target_datetime was requested, we return everything
             if target_datetime:
                 return [
@@ -1056,8 +1242,7 @@ def fetch_production(
     Gets values and corresponding datetimes for all production types in the specified zone.
     Removes any values that are in the future or don't have a datetime associated with them.
     """
-    if not session:
-        session = Session()
+    session = _get_session(session)
     domain = ENTSOE_DOMAIN_MAPPINGS[zone_key]
     # Grab production
     parsed = parse_production(
@@ -1075,7 +1260,7 @@ def fetch_production(
 
     data = []
     for i in range(len(production_dates)):
-        production_values = {k: v for k, v in productions[i].items()}
+        production_values = productions[i]
         production_date = production_dates[i]
 
         production_types = {"production": {}, "storage": {}}
@@ -1107,17 +1292,17 @@ def fetch_production(
             }
         )
 
-        for d in data:
-            for k, v in d["production"].items():
-                if v is None:
-                    continue
-                if v < 0 and v > -50:
-                    # Set small negative values to 0
-                    logger.warning(
-                        "Setting small value of %s (%s) to 0." % (k, v),
-                        extra={"key": zone_key},
-                    )
-                    d["production"][k] = 0
+    for d in data:
+        for k, v in d["production"].items():
+            if v is None:
+                continue
+            if v < 0 and v > -50:
+                # Set small negative values to 0
+                logger.warning(
+                    "Setting small value of %s (%s) to 0." % (k, v),
+                    extra={"key": zone_key},
+                )
+                d["production"][k] = 0
 
     return list(filter(lambda x: validate_production(x, logger), data))
 
@@ -1189,36 +1374,42 @@ def fetch_production_per_units(
     logger: Logger = getLogger(__name__),
 ) -> list:
     """Returns all production units and production values."""
-    if not session:
-        session = Session()
+    session = _get_session(session)
     domain = ENTSOE_EIC_MAPPING[zone_key]
     data = []
-    # Iterate over all psr types
-    for k in ENTSOE_PARAMETER_DESC.keys():
-        try:
-            raw_production_per_units = query_production_per_units(
-                k, domain, session, target_datetime
-            )
-            if raw_production_per_units is not None:
-                values = parse_production_per_units(raw_production_per_units) or []
-                for v in values:
-                    if not v:
-                        continue
-                    v["source"] = "entsoe.eu"
-                    if not v["unitName"] in ENTSOE_UNITS_TO_ZONE:
-                        logger.warning(
-                            f"Unknown unit {v['unitName']} with id {v['unitKey']}"
-                        )
-                    else:
-                        v["zoneKey"] = ENTSOE_UNITS_TO_ZONE[v["unitName"]]
-                        if v["zoneKey"] == zone_key:
-                            data.append(v)
-        except:
-            ParserException(
-                parser="ENTSOE.py",
-                message=f"Failed to fetch data for {k} in {zone_key}",
-                zone_key=zone_key,
-            )
+    # Query all psr types concurrently; each query is dominated by the
+    # round-trip to the ENTSOE API.
+    with ThreadPoolExecutor(max_workers=ENTSOE_MAX_CONCURRENCY) as executor:
+        futures = {
+            executor.submit(
+                query_production_per_units, k, domain, session, target_datetime
+            ): k
+            for k in ENTSOE_PARAMETER_DESC.keys()
+        }
+        for future in as_completed(futures):
+            k = futures[future]
+            try:
+                raw_production_per_units = future.result()
+                if raw_production_per_units is not None:
+                    values = parse_production_per_units(raw_production_per_units) or []
+                    for v in values:
+                        if not v:
+                            continue
+                        v["source"] = "entsoe.eu"
+                        if not v["unitName"] in ENTSOE_UNITS_TO_ZONE:
+                            logger.warning(
+                                f"Unknown unit {v['unitName']} with id {v['unitKey']}"
+                            )
+                        else:
+                            v["zoneKey"] = ENTSOE_UNITS_TO_ZONE[v["unitName"]]
+                            if v["zoneKey"] == zone_key:
+                                data.append(v)
+            except:
+                ParserException(
+                    parser="ENTSOE.py",
+                    message=f"Failed to fetch data for {k} in {zone_key}",
+                    zone_key=zone_key,
+                )
 
     return data
 
@@ -1230,13 +1421,17 @@ def fetch_exchange(
     session: Optional[Session] = None,
     target_datetime: Optional[datetime] = None,
     logger: Logger = getLogger(__name__),
-) -> list:
+    *,
+    columnar: bool = False,
+) -> Union[list, dict]:
     """
     Gets exchange status between two specified zones.
     Removes any datapoints that are in the future.
+
+    When `columnar` is set, returns a single dict of parallel lists instead
+    of one dict per datapoint.
     """
-    if not session:
-        session = Session()
+    session = _get_session(session)
     sorted_zone_keys = sorted([zone_key1, zone_key2])
     key = "->".join(sorted_zone_keys)
     if key in ENTSOE_EXCHANGE_DOMAIN_OVERRIDE:
@@ -1246,20 +1441,26 @@ def fetch_exchange(
         domain2 = ENTSOE_DOMAIN_MAPPINGS[zone_key2]
     # Create a hashmap with key (datetime)
     exchange_hashmap = {}
-    # Grab exchange
-    # Import
-    raw_exchange = query_exchange(domain1, domain2, session, target_datetime)
-    if raw_exchange is not None:
+    # Grab the import and export exchanges in parallel; both round-trips are
+    # needed to compute the net flow.
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        import_future = executor.submit(
+            query_exchange, domain1, domain2, session, target_datetime
+        )
+        export_future = executor.submit(
+            query_exchange, domain2, domain1, session, target_datetime
+        )
+        raw_import = import_future.result()
+        raw_export = export_future.result()
+    if raw_import is not None:
         parsed = parse_exchange(
-            raw_exchange,
+            raw_import,
             is_import=True,
         )
         if parsed:
-            # Export
-            raw_exchange = query_exchange(domain2, domain1, session, target_datetime)
-            if raw_exchange is not None:
+            if raw_export is not None:
                 parsed = parse_exchange(
-                    xml_text=raw_exchange,
+                    xml_text=raw_export,
                     is_import=False,
                     quantities=parsed[0],
                     datetimes=parsed[1],
@@ -1270,25 +1471,34 @@ def fetch_exchange(
                         exchange_hashmap[datetimes[i]] = quantities[i]
 
         # Remove all dates in the future
-        exchange_dates = sorted(set(exchange_hashmap.keys()), reverse=True)
-        exchange_dates = list(filter(lambda x: x <= arrow.now(), exchange_dates))
+        now = arrow.now()
+        exchange_dates = sorted(
+            (d for d in exchange_hashmap.keys() if d <= now), reverse=True
+        )
         if not len(exchange_dates):
             raise ParserException(parser="ENTSOE.py", message="No exchange data found")
-        data = []
-        for exchange_date in exchange_dates:
-            net_flow = float(exchange_hashmap[exchange_date])
-            data.append(
-                {
-                    "sortedZoneKeys": key,
-                    "datetime": exchange_date,
-                    "netFlow": net_flow
-                    if zone_key1[0] == sorted_zone_keys
-                    else -1 * net_flow,
-                    "source": "entsoe.eu",
-                }
-            )
-
-        return data
+        net_flows = [
+            float(exchange_hashmap[exchange_date])
+            if zone_key1[0] == sorted_zone_keys
+            else -1 * float(exchange_hashmap[exchange_date])
+            for exchange_date in exchange_dates
+        ]
+        if columnar:
+            return {
+                "sortedZoneKeys": key,
+                "datetime": exchange_dates,
+                "netFlow": net_flows,
+                "source": "entsoe.eu",
+            }
+        return [
+            {
+                "sortedZoneKeys": key,
+                "datetime": exchange_date,
+                "netFlow": net_flow,
+                "source": "entsoe.eu",
+            }
+            for exchange_date, net_flow in zip(exchange_dates, net_flows)
+        ]
     else:
         raise ParserException(
             parser="entsoe.eu",
@@ -1305,8 +1515,7 @@ def fetch_exchange_forecast(
     logger: Logger = getLogger(__name__),
 ) -> list:
     """Gets exchange forecast between two specified zones."""
-    if not session:
-        session = Session()
+    session = _get_session(session)
     sorted_zone_keys = sorted([zone_key1, zone_key2])
     key = "->".join(sorted_zone_keys)
     if key in ENTSOE_EXCHANGE_DOMAIN_OVERRIDE:
@@ -1316,25 +1525,34 @@ def fetch_exchange_forecast(
         domain2 = ENTSOE_DOMAIN_MAPPINGS[zone_key2]
     # Create a hashmap with key (datetime)
     exchange_hashmap = {}
-    # Grab exchange
-    # Import
+    # Grab the import and export exchange forecasts in parallel.
     parsed = None
-    raw_exchange_forecast = query_exchange_forecast(
-        domain1, domain2, session, target_datetime=target_datetime
-    )
-    if raw_exchange_forecast is not None:
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        import_future = executor.submit(
+            query_exchange_forecast,
+            domain1,
+            domain2,
+            session,
+            target_datetime=target_datetime,
+        )
+        export_future = executor.submit(
+            query_exchange_forecast,
+            domain2,
+            domain1,
+            session,
+            target_datetime=target_datetime,
+        )
+        raw_import = import_future.result()
+        raw_export = export_future.result()
+    if raw_import is not None:
         parsed = parse_exchange(
-            raw_exchange_forecast,
+            raw_import,
             is_import=True,
         )
     if parsed is not None:
-        # Export
-        raw_exchange_forecast = query_exchange_forecast(
-            domain2, domain1, session, target_datetime=target_datetime
-        )
-        if raw_exchange_forecast is not None:
+        if raw_export is not None:
             parsed = parse_exchange(
-                xml_text=raw_exchange_forecast,
+                xml_text=raw_export,
                 is_import=False,
                 quantities=parsed[0],
                 datetimes=parsed[1],
@@ -1344,9 +1562,8 @@ def fetch_exchange_forecast(
             for i in range(len(quantities)):
                 exchange_hashmap[datetimes[i]] = quantities[i]
 
-    # Remove all dates in the future
     sorted_zone_keys = sorted([zone_key1, zone_key2])
-    exchange_dates = list(sorted(set(exchange_hashmap.keys()), reverse=True))
+    exchange_dates = sorted(exchange_hashmap.keys(), reverse=True)
     if not len(exchange_dates):
         raise ParserException(
             parser="ENTSOE.py",
@@ -1374,11 +1591,16 @@ def fetch_price(
     session: Optional[Session] = None,
     target_datetime: Optional[datetime] = None,
     logger: Logger = getLogger(__name__),
-) -> list:
-    """Gets day-ahead price for specified zone."""
+    *,
+    columnar: bool = False,
+) -> Union[list, dict]:
+    """Gets day-ahead price for specified zone.
+
+    When `columnar` is set, returns a single dict of parallel lists instead
+    of one dict per datapoint.
+    """
     # Note: This is day-ahead prices
-    if not session:
-        session = Session()
+    session = _get_session(session)
     if zone_key in ENTSOE_PRICE_DOMAIN_OVERRIDE:
         domain = ENTSOE_PRICE_DOMAIN_OVERRIDE[zone_key]
     else:
@@ -1389,20 +1611,25 @@ def fetch_price(
     if raw_price is not None:
         parsed = parse_price(raw_price)
     if parsed is not None:
-        data = []
         prices, currencies, datetimes = parsed
-        for i in range(len(prices)):
-            data.append(
-                {
-                    "zoneKey": zone_key,
-                    "datetime": datetimes[i],
-                    "currency": currencies[i],
-                    "price": prices[i],
-                    "source": "entsoe.eu",
-                }
-            )
-
-        return data
+        if columnar:
+            return {
+                "zoneKey": zone_key,
+                "datetime": datetimes,
+                "currency": currencies,
+                "price": prices,
+                "source": "entsoe.eu",
+            }
+        return [
+            {
+                "zoneKey": zone_key,
+                "datetime": dt,
+                "currency": currency,
+                "price": price,
+                "source": "entsoe.eu",
+            }
+            for dt, currency, price in zip(datetimes, currencies, prices)
+        ]
     else:
         raise ParserException(
             parser="ENTSOE.py",
@@ -1411,45 +1638,60 @@ def fetch_price(
         )
 
 
-@refetch_frequency(timedelta(days=2))
-def fetch_generation_forecast(
+def _iter_forecast(
+    zone_key: str, values: List[float], datetimes: List[datetime]
+) -> Iterator[dict]:
+    """Yields one datapoint dict per parsed forecast value.
+
+    Callers that stream rows (e.g. straight into a writer) can consume this
+    lazily; _fetch_forecast materializes it for the list-returning API.
+    """
+    base = {"zoneKey": zone_key, "source": _SOURCE}
+    for value, dt in zip(values, datetimes):
+        yield {**base, "datetime": dt, "value": value}
+
+
+def _fetch_forecast(
     zone_key: str,
-    session: Optional[Session] = None,
-    target_datetime: Optional[datetime] = None,
-    logger: Logger = getLogger(__name__),
+    session: Optional[Session],
+    target_datetime: Optional[datetime],
+    query_fn: Callable,
+    parse_kwargs: dict,
+    not_found_message: str,
 ) -> list:
-    """Gets generation forecast for specified zone."""
-    if not session:
-        session = Session()
+    """Shared implementation of the scalar forecast fetchers."""
+    session = _get_session(session)
     domain = ENTSOE_DOMAIN_MAPPINGS[zone_key]
     parsed = None
-    # Grab consumption
-    test = query_generation_forecast(domain, session, target_datetime=target_datetime)
-    if test is not None:
-        parsed = parse_scalar(
-            test,
-            only_inBiddingZone_Domain=True,
-        )
-    if parsed is not None:
-        data = []
-        values, datetimes = parsed
-        for i in range(len(values)):
-            data.append(
-                {
-                    "zoneKey": zone_key,
-                    "datetime": datetimes[i],
-                    "value": values[i],
-                    "source": "entsoe.eu",
-                }
-            )
-
-        return data
-    else:
+    raw_forecast = query_fn(domain, session, target_datetime=target_datetime)
+    if raw_forecast is not None:
+        parsed = parse_scalar(raw_forecast, **parse_kwargs)
+    if parsed is None:
         raise ParserException(
             parser="ENTSOE.py",
-            message=f"No generation forecast data found for {zone_key}",
+            message=not_found_message,
             zone_key=zone_key,
         )
+    values, datetimes = parsed
+    return list(_iter_forecast(zone_key, values, datetimes))
+
+
+@refetch_frequency(timedelta(days=2))
+def fetch_generation_forecast(
+    zone_key: str,
+    session: Optional[Session] = None,
+    target_datetime: Optional[datetime] = None,
+    logger: Logger = getLogger(__name__),
+) -> list:
+    """Gets generation forecast for specified zone."""
+    return _fetch_forecast(
+        zone_key,
+        session,
+        target_datetime,
+        query_fn=query_generation_forecast,
+        parse_kwargs={"only_inBiddingZone_Domain": True},
+        not_found_message=f"No generation forecast data found for {zone_key}",
+    )
 
 
 @refetch_frequency(timedelta(days=2))
@@ -1460,39 +1702,14 @@ def fetch_consumption_forecast(
     logger: Logger = getLogger(__name__),
 ) -> list:
     """Gets consumption forecast for specified zone."""
-    if not session:
-        session = Session()
-    domain = ENTSOE_DOMAIN_MAPPINGS[zone_key]
-    # Grab consumption
-    parsed = None
-    raw_consumption_forecast = query_consumption_forecast(
-        domain, session, target_datetime=target_datetime
+    return _fetch_forecast(
+        zone_key,
+        session,
+        target_datetime,
+        query_fn=query_consumption_forecast,
+        parse_kwargs={"only_outBiddingZone_Domain": True},
+        not_found_message=f"No consumption forecast found for {zone_key}",
     )
-    if raw_consumption_forecast is not None:
-        parsed = parse_scalar(
-            raw_consumption_forecast,
-            only_outBiddingZone_Domain=True,
-        )
-    if parsed is not None:
-        data = []
-        values, datetimes = parsed
-        for i in range(len(values)):
-            data.append(
-                {
-                    "zoneKey": zone_key,
-                    "datetime": datetimes[i],
-                    "value": values[i],
-                    "source": "entsoe.eu",
-                }
-            )
-
-        return data
-    else:
-        raise ParserException(
-            parser="ENTSOE.py",
-            message=f"No consumption forecast found for {zone_key}",
-            zone_key=zone_key,
-        )
 
 
 @refetch_frequency(timedelta(days=2))
@@ -1506,8 +1723,7 @@ def fetch_wind_solar_forecasts(
     Gets values and corresponding datetimes for all production types in the specified zone.
     Removes any values that are in the future or don't have a datetime associated with them.
     """
-    if not session:
-        session = Session()
+    session = _get_session(session)
     domain = ENTSOE_DOMAIN_MAPPINGS[zone_key]
     # Grab production
     parsed = parse_production(
@@ -1527,9 +1743,7 @@ def fetch_wind_solar_forecasts(
 
     data = []
     for i in range(len(production_dates)):
-        production_values = {
-            ENTSOE_PARAMETER_DESC[k]: v for k, v in productions[i].items()
-        }
+        production_values = productions[i]
         production_date = production_dates[i]
 
         data.append(
@@ -1537,7 +1751,7 @@ def fetch_wind_solar_forecasts(
                 "zoneKey": zone_key,
                 "datetime": production_date,
                 "production": {
-                    "solar": production_values.get("Solar", None),
+                    "solar": production_values.get("B16", None),
                     "wind": get_wind(production_values),
                 },
                 "source": "entsoe.eu",
@@ -0,0 +1,68 @@
+"""
+Disk-backed cache for immutable ENTSOE responses.
+
+Used by parsers.ENTSOE during historical backfills: a query window that lies
+fully in the past never changes, so its raw XML response can be persisted
+and reused across runs without any round-trip to the ENTSOE API.
+
+The cache is opt-in and enabled by pointing the ENTSOE_CACHE_DIR environment
+variable at a writable directory.
+"""
+import os
+import sqlite3
+from threading import Lock
+from typing import Optional
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    cache_key TEXT PRIMARY KEY,
+    xml_text TEXT NOT NULL,
+    stored_at INTEGER NOT NULL
+)
+"""
+
+
+class ResponseCache:
+    """A small sqlite-backed key/value store of raw ENTSOE responses."""
+
+    def __init__(self, cache_dir: str):
+        os.makedirs(cache_dir, exist_ok=True)
+        self._connection = sqlite3.connect(
+            os.path.join(cache_dir, "entsoe.sqlite"), check_same_thread=False
+        )
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(_SCHEMA)
+        self._connection.commit()
+        self._lock = Lock()
+
+    def get(self, cache_key: str) -> Optional[str]:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT xml_text FROM responses WHERE cache_key = ?", (cache_key,)
+            ).fetchone()
+        return row[0] if row is not None else None
+
+    def set(self, cache_key: str, xml_text: str) -> None:
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses (cache_key, xml_text, stored_at) "
+                "VALUES (?, ?, strftime('%s', 'now'))",
+                (cache_key, xml_text),
+            )
+            self._connection.commit()
+
+
+_cache: Optional[ResponseCache] = None
+_cache_lock = Lock()
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """Returns the shared disk cache, or None when ENTSOE_CACHE_DIR is unset."""
+    cache_dir = os.environ.get("ENTSOE_CACHE_DIR")
+    if not cache_dir:
+        return None
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache(cache_dir)
+        return _cache
@@ -0,0 +1,36 @@
+import os
+import tempfile
+import unittest
+
+from parsers.lib import entsoe_cache
+
+
+class TestResponseCache(unittest.TestCase):
+    def test_roundtrip(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = entsoe_cache.ResponseCache(cache_dir)
+            self.assertIsNone(cache.get("some_key"))
+            cache.set("some_key", "<xml/>")
+            self.assertEqual(cache.get("some_key"), "<xml/>")
+            # Overwrites keep the latest value
+            cache.set("some_key", "<other/>")
+            self.assertEqual(cache.get("some_key"), "<other/>")
+
+    def test_persists_across_instances(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            entsoe_cache.ResponseCache(cache_dir).set("some_key", "<xml/>")
+            self.assertEqual(
+                entsoe_cache.ResponseCache(cache_dir).get("some_key"), "<xml/>"
+            )
+
+    def test_disabled_without_env_var(self):
+        old_value = os.environ.pop("ENTSOE_CACHE_DIR", None)
+        try:
+            self.assertIsNone(entsoe_cache.get_response_cache())
+        finally:
+            if old_value is not None:
+                os.environ["ENTSOE_CACHE_DIR"] = old_value
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,177 @@
+#!/usr/bin/python
+
+"""Tests for the in-process response cache used by query_ENTSOE."""
+import os
+import unittest
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from threading import Thread
+from time import monotonic
+
+from requests import Session
+from requests.adapters import HTTPAdapter
+
+from parsers import ENTSOE
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, text="", headers=None):
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers or {}
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+
+class FakeSession:
+    """Serves a scripted list of responses and records each request."""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def get(self, url, params=None, headers=None):
+        self.requests.append({"params": dict(params), "headers": headers})
+        return self.responses.pop(0)
+
+
+class _ServiceUnavailableHandler(BaseHTTPRequestHandler):
+    """Answers every request with 503 and counts them."""
+
+    request_count = 0
+
+    def do_GET(self):
+        type(self).request_count += 1
+        self.send_response(503)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _expire_cache_entries():
+    """Rewrites every cached entry so it is already expired."""
+    with ENTSOE._response_cache_lock:
+        for cache_key, (_, xml_text, validators) in ENTSOE._response_cache.items():
+            ENTSOE._response_cache[cache_key] = (monotonic() - 1, xml_text, validators)
+
+
+class ResponseCacheTestCase(unittest.TestCase):
+    """Tests for the TTL cache, conditional revalidation and stale fallback."""
+
+    params = {"documentType": "A65", "outBiddingZone_Domain": "10YFR-RTE------C"}
+    target_datetime = datetime(2021, 12, 1, 12, 0)
+    xml_text = "<GL_MarketDocument/>"
+
+    def setUp(self):
+        self.old_token = os.environ.get("ENTSOE_TOKEN")
+        os.environ["ENTSOE_TOKEN"] = "test-token"
+        # Keep the optional disk cache out of these tests.
+        self.old_cache_dir = os.environ.pop("ENTSOE_CACHE_DIR", None)
+        with ENTSOE._response_cache_lock:
+            ENTSOE._response_cache.clear()
+
+    def tearDown(self):
+        if self.old_token is None:
+            os.environ.pop("ENTSOE_TOKEN", None)
+        else:
+            os.environ["ENTSOE_TOKEN"] = self.old_token
+        if self.old_cache_dir is not None:
+            os.environ["ENTSOE_CACHE_DIR"] = self.old_cache_dir
+        with ENTSOE._response_cache_lock:
+            ENTSOE._response_cache.clear()
+
+    def _query(self, session):
+        return ENTSOE.query_ENTSOE(
+            session, dict(self.params), target_datetime=self.target_datetime
+        )
+
+    def test_cache_hit_skips_network(self):
+        session = FakeSession([FakeResponse(text=self.xml_text)])
+        self.assertEqual(self._query(session), self.xml_text)
+        self.assertEqual(len(session.requests), 1)
+        # The repeated query is served from the cache without a request.
+        self.assertEqual(self._query(session), self.xml_text)
+        self.assertEqual(len(session.requests), 1)
+
+    def test_expired_entry_revalidated_with_304(self):
+        session = FakeSession(
+            [
+                FakeResponse(
+                    text=self.xml_text,
+                    headers={
+                        "ETag": '"abc"',
+                        "Last-Modified": "Wed, 01 Dec 2021 12:00:00 GMT",
+                    },
+                ),
+                FakeResponse(status_code=304),
+            ]
+        )
+        self._query(session)
+        _expire_cache_entries()
+        # The expired entry is revalidated conditionally; the 304 answer
+        # keeps the cached body without a full transfer.
+        self.assertEqual(self._query(session), self.xml_text)
+        self.assertEqual(len(session.requests), 2)
+        self.assertEqual(
+            session.requests[1]["headers"],
+            {
+                "If-None-Match": '"abc"',
+                "If-Modified-Since": "Wed, 01 Dec 2021 12:00:00 GMT",
+            },
+        )
+        # The 304 refreshed the entry, so the next query needs no request.
+        self.assertEqual(self._query(session), self.xml_text)
+        self.assertEqual(len(session.requests), 2)
+
+    def test_all_tokens_failing_returns_stale_body(self):
+        os.environ["ENTSOE_TOKEN"] = "token1,token2"
+        session = FakeSession(
+            [
+                FakeResponse(text=self.xml_text),
+                FakeResponse(status_code=500, text="server error"),
+                FakeResponse(status_code=500, text="server error"),
+            ]
+        )
+        self._query(session)
+        _expire_cache_entries()
+        # Both tokens fail, so the expired body is served instead of raising.
+        self.assertEqual(self._query(session), self.xml_text)
+        self.assertEqual(len(session.requests), 3)
+
+    def test_stale_body_served_with_shipped_retry_adapter(self):
+        # Same scenario as above, but against a real HTTP server answering
+        # 503, through the retry policy the default session ships with: the
+        # exhausted retries must hand the response back (raise_on_status is
+        # False) so the stale fallback still runs, rather than raising
+        # RetryError out of session.get.
+        self._query(FakeSession([FakeResponse(text=self.xml_text)]))
+        _expire_cache_entries()
+
+        server = HTTPServer(("127.0.0.1", 0), _ServiceUnavailableHandler)
+        Thread(target=server.serve_forever, daemon=True).start()
+        shipped_retries = ENTSOE._DEFAULT_SESSION.get_adapter(
+            ENTSOE.ENTSOE_ENDPOINT
+        ).max_retries
+        session = Session()
+        session.mount(
+            # Only the backoff sleeps are disabled to keep the test fast.
+            "http://",
+            HTTPAdapter(max_retries=shipped_retries.new(backoff_factor=0)),
+        )
+        old_endpoint = ENTSOE.ENTSOE_ENDPOINT
+        ENTSOE.ENTSOE_ENDPOINT = f"http://127.0.0.1:{server.server_port}"
+        try:
+            self.assertEqual(self._query(session), self.xml_text)
+        finally:
+            ENTSOE.ENTSOE_ENDPOINT = old_endpoint
+            server.shutdown()
+            server.server_close()
+        self.assertGreater(_ServiceUnavailableHandler.request_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()